@@ -1,3 +1,6 @@
+from functools import lru_cache
+
+from utils.parallel import parallel_map
 from utils.remote_inference import Converser
 from utils.prompts import (
     eval_llama3_jailbroken_judge_prompt,
@@ -5,6 +8,9 @@ from utils.prompts import (
 )
 
 
+# the classifier is called with temperature=0, so identical (query, response)
+# pairs can reuse the verdict instead of paying another LLM round-trip
+@lru_cache(maxsize=None)
 def is_jailbroken(query, response, classifier_model="meta-llama/Llama-3-70b-chat-hf"):
     judge = Converser(classifier_model, system_prompt="")
     return (
@@ -15,6 +21,30 @@ def is_jailbroken(query, response, classifier_model="meta-llama/Llama-3-70b-chat
     )
 
 
+def is_jailbroken_batch(
+    queries,
+    responses,
+    classifier_model="meta-llama/Llama-3-70b-chat-hf",
+    requests_per_minute=None,
+):
+    """
+    Classify many (query, response) pairs at once. The classifier is a remote
+    model, so the batch is issued as a single concurrent fan-out; verdicts come
+    back in input order and share is_jailbroken's cache. requests_per_minute
+    (an int or a shared RateLimiter) caps how fast the fan-out issues calls.
+    """
+    queries, responses = list(queries), list(responses)
+    if not queries:
+        return []
+    return parallel_map(
+        is_jailbroken,
+        queries,
+        responses,
+        [classifier_model],
+        requests_per_minute=requests_per_minute,
+    )
+
+
 def is_refusal(query, response):
     judge = Converser("meta-llama/Llama-3-70b-chat-hf", system_prompt="")
     return (
@@ -1,9 +1,42 @@
 import concurrent.futures
+import threading
+import time
 from itertools import repeat
 from tqdm import tqdm
 
 
-def parallel_map(f, *args, concurrency=25, use_tqdm=False, **kwargs):
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting how many calls may start per minute.
+    Lets high-concurrency parallel_map runs saturate a provider's rate limit
+    without tripping 429s.
+    """
+
+    def __init__(self, requests_per_minute):
+        self.capacity = requests_per_minute
+        self.tokens = float(requests_per_minute)
+        self.fill_rate = requests_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.fill_rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait)
+
+
+def parallel_map(
+    f, *args, concurrency=25, use_tqdm=False, requests_per_minute=None, **kwargs
+):
     """
     Parallel map function that supports both args and kwargs.
 
@@ -11,9 +44,23 @@ def parallel_map(f, *args, concurrency=25, use_tqdm=False, **kwargs):
     :param args: Positional arguments to be mapped
     :param concurrency: Number of concurrent threads (default: 25)
     :param use_tqdm: use tqdm to show a progress bar
+    :param requests_per_minute: optional cap on calls started per minute,
+        enforced with a shared token bucket across all workers. Pass a
+        RateLimiter instance instead of an int to share one budget across
+        several parallel_map calls.
     :param kwargs: Keyword arguments to be mapped
     :return: List of results
     """
+    if requests_per_minute is not None:
+        if isinstance(requests_per_minute, RateLimiter):
+            limiter = requests_per_minute
+        else:
+            limiter = RateLimiter(requests_per_minute)
+        inner_f = f
+
+        def f(*f_args, **f_kwargs):
+            limiter.acquire()
+            return inner_f(*f_args, **f_kwargs)
 
     def ensure_iterable(arg):
         return (
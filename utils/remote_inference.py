@@ -2,9 +2,11 @@ from easyjailbreak.models.openai_model import OpenaiModel
 from together import Together
 from openai import OpenAI
 from fastchat.conversation import get_conv_template, Conversation
+import hashlib
 import os
 import json
 import requests
+import threading
 from copy import deepcopy
 from utils.constants import TOGETHER_API_KEY, OPENAI_API_KEY
 import time
@@ -126,6 +128,23 @@ class RemoteInferenceModel(OpenaiModel):
                 conversation.append_message(conversation.roles[index % 2], message)
         messages = conversation.to_openai_api_messages()
 
+        if self.model_name.startswith("claude"):
+            # Anthropic prompt caching: mark the static system prefix as
+            # cacheable so repeated calls only pay prefill for the dynamic
+            # suffix. OpenAI caches identical prefixes automatically, so no
+            # tagging is needed there.
+            for message in messages:
+                if message["role"] == "system" and isinstance(
+                    message["content"], str
+                ):
+                    message["content"] = [
+                        {
+                            "type": "text",
+                            "text": message["content"],
+                            "cache_control": {"type": "ephemeral"},
+                        }
+                    ]
+
         if self.blocked_by_guard(messages):
             return "I'm sorry, I cannot fulfil that request"
 
@@ -159,6 +178,51 @@ class RemoteInferenceModel(OpenaiModel):
         return responses
 
 
+class CachedGenerationModel:
+    """
+    Thin wrapper that memoizes generate() calls on the wrapped model, keyed by
+    a hash of the system message, the messages, and the generation kwargs.
+    Identical prompts return the stored response instead of hitting the
+    provider again, which matters for attacks that re-send the same
+    (mutation, query) pair across evolution iterations. All other attributes
+    are forwarded to the wrapped model.
+    """
+
+    def __init__(self, model, cache=None):
+        self._model = model
+        self._cache = cache if cache is not None else {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def _cache_key(self, messages, kwargs):
+        system_message = getattr(
+            getattr(self._model, "conversation", None), "system_message", None
+        )
+        hasher = hashlib.blake2b()
+        hasher.update(repr(system_message).encode())
+        hasher.update(repr(messages).encode())
+        hasher.update(repr(sorted(kwargs.items())).encode())
+        return hasher.hexdigest()
+
+    def generate(self, messages, **kwargs):
+        key = self._cache_key(messages, kwargs)
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        response = self._model.generate(messages, **kwargs)
+        with self._lock:
+            self._cache[key] = response
+        return response
+
+    def set_system_message_thread_safe(self, system_message: str):
+        return CachedGenerationModel(
+            self._model.set_system_message_thread_safe(system_message),
+            cache=self._cache,
+        )
+
+
 class Converser:
     def __init__(self, model, system_prompt=None, chat=None, **kwargs):
         self.inference = RemoteInferenceModel(model, **kwargs)
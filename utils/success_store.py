@@ -0,0 +1,48 @@
+import hashlib
+import sqlite3
+import threading
+
+
+class SuccessStore:
+    """
+    Small sqlite-backed map from a query's hash to the prompt that jailbroke
+    it in a previous run. Lets reruns over overlapping datasets re-verify one
+    known-good prompt per solved query instead of paying the full attack
+    budget again. Safe to share across worker threads.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS successes ("
+                "query_hash TEXT PRIMARY KEY, "
+                "mutated_query TEXT, "
+                "jailbreak_prompt TEXT)"
+            )
+            self.conn.commit()
+
+    @staticmethod
+    def _key(query):
+        return hashlib.sha1(query.encode()).hexdigest()
+
+    def get(self, query):
+        """
+        :return tuple|None: (mutated_query, jailbreak_prompt) recorded for
+            this query, or None if it has never succeeded.
+        """
+        with self.lock:
+            return self.conn.execute(
+                "SELECT mutated_query, jailbreak_prompt FROM successes "
+                "WHERE query_hash = ?",
+                (self._key(query),),
+            ).fetchone()
+
+    def put(self, query, mutated_query, jailbreak_prompt):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO successes VALUES (?, ?, ?)",
+                (self._key(query), mutated_query, jailbreak_prompt),
+            )
+            self.conn.commit()